@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Проверка экспорта PIV лога в Parquet (test1/piv_export.py).
+
+Лог экспортируется во временный каталог с маленькими группами строк,
+затем каждая таблица читается через read_piv_table - целиком, с выбором
+колонок и с фильтром по времени - и сравнивается со значениями,
+разобранными напрямую через parse_piv_message.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test1'))
+
+import piv_export
+from piv_export import NO_DATA, export_piv_log, parse_piv_message, read_piv_table
+
+# Маленькие группы строк, чтобы фильтр по времени пропускал часть групп
+ROW_GROUP_SIZE = 16
+
+def expected_rows(filename):
+    """Строки лога по типам сообщений: {тип: [(время, {ключ: значение})]}"""
+    rows = {}
+    with open(filename, 'r', errors='replace') as f:
+        for line in f:
+            message = parse_piv_message(line)
+            if message is None:
+                continue
+            time, msg_type, fields = message
+            values = {}
+            for key, value, _ in fields:
+                if value == NO_DATA:
+                    continue
+                if value.startswith("'"):
+                    value = value[1:-1]
+                values[key] = value
+            rows.setdefault(msg_type, []).append((time, values))
+    for table in rows.values():
+        table.sort(key=lambda row: row[0])
+    return rows
+
+def same_value(actual, expected):
+    if expected is None:
+        return actual is None
+    if isinstance(actual, str):
+        return actual == expected
+    return actual is not None and actual == float(expected)
+
+def compare(table, rows, columns, label):
+    """Сравниваем таблицу Arrow с ожидаемыми строками"""
+    errors = []
+    if table.column_names != ['time'] + columns:
+        return [f"{label}: колонки {table.column_names}"]
+    if table.num_rows != len(rows):
+        return [f"{label}: {table.num_rows} строк вместо {len(rows)}"]
+    data = table.to_pydict()
+    for i, (time, values) in enumerate(rows):
+        if data['time'][i] != time:
+            errors.append(f"{label}: строка {i}, время {data['time'][i]} вместо {time}")
+            break
+        for key in columns:
+            if not same_value(data[key][i], values.get(key)):
+                errors.append(f"{label}: строка {i}, {key}={data[key][i]!r} вместо {values.get(key)!r}")
+                break
+    return errors[:5]
+
+def check_file(filename):
+    """Проверяем один лог, возвращаем список ошибок"""
+    errors = []
+    expected = expected_rows(filename)
+    with tempfile.TemporaryDirectory() as tmp:
+        counts = export_piv_log(filename, tmp, ROW_GROUP_SIZE)
+        if counts != {msg_type: len(rows) for msg_type, rows in expected.items()}:
+            errors.append(f"число строк {counts}")
+
+        for msg_type, rows in expected.items():
+            table = read_piv_table(tmp, msg_type)
+            columns = table.column_names[1:]
+            errors += compare(table, rows, columns, msg_type)
+
+            # Поля-идентификаторы всегда текстовые
+            for key in columns:
+                fixed = msg_type in piv_export.STRING_TYPES or key in piv_export.STRING_FIELDS
+                if fixed and not str(table.schema.field(key).type).startswith('dictionary'):
+                    errors.append(f"{msg_type}.{key}: тип {table.schema.field(key).type}")
+
+            # Выбор колонок и фильтр по времени (середина лога, границы включены)
+            times = [time for time, _ in rows]
+            start = times[len(times) // 4]
+            end = times[(3 * len(times)) // 4]
+            selected = columns[::2]
+            inside = [row for row in rows if start <= row[0] <= end]
+            table = read_piv_table(tmp, msg_type, selected, (start, end))
+            errors += compare(table, inside, selected, f"{msg_type} [{start}, {end}]")
+
+            # Открытые интервалы
+            table = read_piv_table(tmp, msg_type, selected, (None, start))
+            errors += compare(table, [row for row in rows if row[0] <= start],
+                              selected, f"{msg_type} [-, {start}]")
+            table = read_piv_table(tmp, msg_type, selected, (end, None))
+            errors += compare(table, [row for row in rows if row[0] >= end],
+                              selected, f"{msg_type} [{end}, -]")
+    return errors
+
+def main():
+    if piv_export.pa is None:
+        print("pyarrow не установлен - проверка пропущена")
+        sys.exit(0)
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    files = sys.argv[1:] or [os.path.join(base, 'test1', '180M-E-Test.txt'),
+                             os.path.join(base, '180M-E.piv'),
+                             os.path.join(base, 'N.piv')]
+
+    failed = False
+    for filename in files:
+        errors = check_file(filename)
+        print(f"{os.path.basename(filename)}: {'ПРОЙДЕН' if not errors else 'НЕ ПРОЙДЕН'}")
+        for error in errors[:10]:
+            print(f"  • {error}")
+        failed |= bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Проверка живого режима --follow (test1/piv_analyzer.py).
+
+- PivLogTail: лог дописывается кусками случайной длины (строки рвутся
+  посередине), чтение идет маленькими блоками. Точки, разобранные по
+  частям, должны совпасть с разбором всего файла, в том числе после
+  ротации (файл переименован и создан заново) и обрезки.
+- _expand_limits: при росте трека пределы осей считаются от настоящих
+  min/max данных, трек занимает не меньше половины оси, а полных
+  перерисовок - логарифмически мало.
+"""
+
+import math
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test1'))
+
+import piv_analyzer
+from piv_analyzer import PivLogTail, parse_piv_lines, _expand_limits
+
+def parse_all(data):
+    """Точки из всего содержимого лога сразу"""
+    times, latitudes, longitudes = [], [], []
+    parse_piv_lines(data.decode('utf-8', errors='replace').splitlines(),
+                    times, latitudes, longitudes)
+    return times, latitudes, longitudes
+
+def follow(tail, points, polls=100000):
+    """Опрашиваем файл, пока не прочитан до конца.
+    Возвращает, был ли файл начат заново"""
+    restarted_any = False
+    for _ in range(polls):
+        lines, restarted = tail.poll()
+        if restarted:
+            restarted_any = True
+            for values in points:
+                values.clear()
+        parse_piv_lines(lines, *points)
+        if not tail.behind and not lines:
+            break
+    return restarted_any
+
+def write_in_chunks(path, data, rng, tail, points):
+    """Дописываем данные кусками, опрашивая файл после каждого"""
+    pos = 0
+    while pos < len(data):
+        size = int(rng.integers(1, 5000))
+        with open(path, 'ab') as f:
+            f.write(data[pos:pos + size])
+        pos += size
+        follow(tail, points)
+
+def check_tail(filename, rng):
+    errors = []
+    with open(filename, 'rb') as f:
+        data = f.read()
+    expected = parse_all(data)
+    half = parse_all(data[:data.rfind(b'\n', 0, len(data) // 2) + 1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'live.piv')
+        open(path, 'wb').close()
+        tail = PivLogTail(path)
+        points = ([], [], [])
+
+        write_in_chunks(path, data, rng, tail, points)
+        if points != expected:
+            errors.append(f"дописывание: {len(points[0])} точек вместо {len(expected[0])}")
+
+        # Ротация: старый файл переименован, новый еще не создан
+        os.rename(path, path + '.1')
+        if tail.poll() != ([], False):
+            errors.append("ротация: ошибка при отсутствии файла")
+        open(path, 'wb').close()
+        write_in_chunks(path, data, rng, tail, points)
+        if points != expected:
+            errors.append(f"ротация: {len(points[0])} точек вместо {len(expected[0])}")
+
+        # Обрезка: файл начинается заново с половины содержимого
+        with open(path, 'wb') as f:
+            f.write(data[:data.rfind(b'\n', 0, len(data) // 2) + 1])
+        if not follow(tail, points):
+            errors.append("обрезка не обнаружена")
+        if points != half:
+            errors.append(f"обрезка: {len(points[0])} точек вместо {len(half[0])}")
+        tail.close()
+    return errors
+
+def check_limits(rng):
+    errors = []
+    chunk = 2000
+    n = 180 * chunk
+    series = {
+        'время': np.arange(n) * 0.05,
+        'долгота': np.cumsum(rng.normal(0.001, 0.01, n)),
+    }
+    for name, values in series.items():
+        data_low = data_high = low = high = None
+        redraws = 0
+        for start in range(0, n, chunk):
+            part = values[start:start + chunk]
+            data_low, data_high, low, high, grew = _expand_limits(
+                data_low, data_high, low, high, part)
+            redraws += grew
+            if data_low != values[:start + chunk].min() or data_high != values[:start + chunk].max():
+                errors.append(f"{name}: неверные min/max данных")
+                break
+            fill = (data_high - data_low) / (high - low)
+            if fill < 0.5:
+                errors.append(f"{name}: трек занимает {fill:.0%} оси после {start + chunk} точек")
+                break
+        if name == 'время' and redraws > 2 + math.log(n / chunk, 1.5):
+            errors.append(f"{name}: {redraws} полных перерисовок на {n // chunk} порций")
+    return errors
+
+def main():
+    base = os.path.dirname(os.path.abspath(__file__))
+    filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base, 'test1', '180M-E-Test.txt')
+    rng = np.random.default_rng(626)
+    # Маленький блок чтения, чтобы опросов с непрочитанным хвостом было много
+    piv_analyzer.FOLLOW_READ_BLOCK = 1000
+
+    failed = False
+    for name, errors in (('PivLogTail', check_tail(filename, rng)),
+                         ('Пределы осей', check_limits(rng))):
+        print(f"{name}: {'ПРОЙДЕН' if not errors else 'НЕ ПРОЙДЕН'}")
+        for error in errors[:10]:
+            print(f"  • {error}")
+        failed |= bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Проверка точной геометрии пространственного индекса (test1/piv_index.py)
+на треках, пересекающих линию дат (±180°) и полюса.
+
+Для каждого отрезка трека (дуги большого круга) результаты
+segments_in_box, segments_near и segment_cells сравниваются с плотной
+выборкой точек на самой дуге:
+- если точка дуги попала в область/круг, точная проверка обязана это найти;
+- если точная проверка нашла пересечение, оно подтверждается более
+  плотной выборкой;
+- каждая точка дуги лежит в одной из ячеек, записанных для отрезка.
+Дополнительно запросы через индекс сравниваются с полным перебором.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test1'))
+
+import piv_index
+from piv_analyzer import parse_piv_lines
+
+# Логи с пересечением линии дат и полюсов
+DEFAULT_FILES = ['180M-E.piv', '180M-W.piv', '180-d.piv',
+                 'N.piv', 'N-d.piv', 'S.piv', 'S-d.piv']
+
+SAMPLES = 2000       # точек на дугу в обычной выборке
+FINE_SAMPLES = 200000  # точек на дугу при подтверждении
+QUERIES = 200        # случайных областей и точек на лог
+
+def load_track(filename):
+    """Трек лога: (времена, широты, долготы)"""
+    times, latitudes, longitudes = [], [], []
+    with open(filename, 'r', errors='replace') as f:
+        parse_piv_lines(f, times, latitudes, longitudes)
+    return np.array(times), np.array(latitudes), np.array(longitudes)
+
+def sample_arc(a, b, count):
+    """Точки на дуге большого круга a->b (slerp)"""
+    angle = piv_index._angle(a, b)
+    s = np.linspace(0.0, 1.0, count)
+    if angle < 1e-15:
+        return np.repeat(a[None, :], count, axis=0)
+    return (np.sin((1 - s) * angle)[:, None] * a + np.sin(s * angle)[:, None] * b) / np.sin(angle)
+
+def point_cells(points):
+    """Номера ячеек сетки для точек"""
+    lat, lon = piv_index._lat_lon(points)
+    rows = np.clip(np.floor((lat + 90) / piv_index.CELL_DEG), 0, piv_index.ROWS - 1).astype(int)
+    cols = np.floor((lon + 180) / piv_index.CELL_DEG).astype(int) % piv_index.COLS
+    polar = (rows == 0) | (rows == piv_index.ROWS - 1)
+    return rows * piv_index.COLS + np.where(polar, 0, cols)
+
+def in_box(points, box):
+    lat_min, lat_max, lon_min, lon_max = box
+    lat, lon = piv_index._lat_lon(points)
+    inside = (lat >= lat_min) & (lat <= lat_max)
+    if not (lon_min == -180 and lon_max == 180):
+        inside &= piv_index._lon_in(lon, lon_min, lon_max) | (np.abs(lat) >= 90 - 1e-9)
+    return inside
+
+def random_box(rng, lat, lon):
+    """Случайная область рядом с точкой трека: обычная, через ±180° или полярная"""
+    kind = rng.integers(3)
+    if kind == 2:
+        edge = rng.uniform(80, 89.99) * np.sign(lat or 1)
+        return (edge, 90.0, -180.0, 180.0) if edge > 0 else (-90.0, edge, -180.0, 180.0)
+    half_lat, half_lon = rng.uniform(0.001, 5, 2)
+    lat_min = max(lat - half_lat * rng.uniform(0, 2), -90.0)
+    lat_max = min(lat_min + 2 * half_lat, 90.0)
+    lon_min = lon - half_lon * rng.uniform(0, 2)
+    lon_max = lon_min + 2 * half_lon
+    if kind == 1:
+        lon_min, lon_max = 180 - half_lon, -180 + half_lon  # через линию дат
+    wrap = lambda x: (x + 180) % 360 - 180
+    return lat_min, lat_max, wrap(lon_min), wrap(lon_max)
+
+def check_file(filename, rng):
+    """Проверяем один лог, возвращаем список ошибок"""
+    errors = []
+    _, lats, lons = load_track(filename)
+    if len(lats) < 2:
+        return [f"в {filename} меньше двух точек"]
+
+    p = piv_index.to_vectors(lats, lons)
+    a, b = p[:-1], p[1:]
+    arcs = [sample_arc(a[i], b[i], SAMPLES) for i in range(len(a))]
+
+    # Ячейки: каждая точка дуги должна лежать в ячейке своего отрезка
+    cells, segs = piv_index.segment_cells(lats, lons)
+    for i, arc in enumerate(arcs):
+        missing = set(point_cells(arc)) - set(cells[segs == i])
+        if missing:
+            errors.append(f"отрезок {i}: ячейки {sorted(missing)[:5]} не записаны")
+
+    for _ in range(QUERIES):
+        k = rng.integers(len(lats))
+
+        box = random_box(rng, lats[k], lons[k])
+        exact = piv_index.segments_in_box(a, b, *box)
+        for i, arc in enumerate(arcs):
+            sampled = in_box(arc, box).any()
+            if sampled and not exact[i]:
+                errors.append(f"область {box}: отрезок {i} пропущен")
+            elif exact[i] and not sampled and not in_box(sample_arc(a[i], b[i], FINE_SAMPLES), box).any():
+                errors.append(f"область {box}: отрезок {i} найден ошибочно")
+
+        center = piv_index.to_vectors(lats[k] + rng.normal(0, 0.5), lons[k] + rng.normal(0, 0.5))
+        radius = rng.uniform(0.1, 300) / piv_index.EARTH_RADIUS_KM
+        exact = piv_index.segments_near(a, b, center, radius)
+        for i, arc in enumerate(arcs):
+            sampled = (piv_index._angle(arc, center) <= radius).any()
+            if sampled and not exact[i]:
+                errors.append(f"точка/радиус: отрезок {i} пропущен")
+            elif exact[i] and not sampled:
+                fine = sample_arc(a[i], b[i], FINE_SAMPLES)
+                if not (piv_index._angle(fine, center) <= radius + 1e-9).any():
+                    errors.append(f"точка/радиус: отрезок {i} найден ошибочно")
+    return errors
+
+def check_index(files, rng):
+    """Запросы через индекс должны совпадать с полным перебором,
+    в том числе при долготах вне [-180, 180) и пути индекса с ?, # и %"""
+    errors = []
+    tracks = {os.path.abspath(f): load_track(f) for f in files}
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, 'a?b#c%20d', 'index.db')
+        os.makedirs(os.path.dirname(index_path))
+        piv_index.update_index(index_path, files)
+        for _ in range(QUERIES):
+            path = list(tracks)[rng.integers(len(tracks))]
+            _, lats, lons = tracks[path]
+            k = rng.integers(len(lats))
+            box = random_box(rng, lats[k], lons[k])
+
+            expected = set()
+            for name, (_, la, lo) in tracks.items():
+                p = piv_index.to_vectors(la, lo)
+                if len(p) > 1 and piv_index.segments_in_box(p[:-1], p[1:], *box).any():
+                    expected.add(name)
+            found = set(piv_index.query_region(index_path, *box))
+            if found != expected:
+                errors.append(f"индекс, область {box}: {sorted(found ^ expected)}")
+
+            # Та же область с долготами, сдвинутыми на 360°
+            lat_min, lat_max, lon_min, lon_max = box
+            if (lon_min, lon_max) != (-180.0, 180.0):
+                shifted = (lat_min, lat_max, lon_min if lon_min > lon_max else lon_min + 360, lon_max + 360)
+                found = set(piv_index.query_region(index_path, *shifted))
+                if found != expected:
+                    errors.append(f"индекс, область {shifted}: {sorted(found ^ expected)}")
+    return errors
+
+def main():
+    base = os.path.dirname(os.path.abspath(__file__))
+    files = sys.argv[1:] or [os.path.join(base, name) for name in DEFAULT_FILES]
+    rng = np.random.default_rng(620)
+
+    failed = False
+    for filename in files:
+        errors = check_file(filename, rng)
+        print(f"{os.path.basename(filename)}: {'ПРОЙДЕН' if not errors else 'НЕ ПРОЙДЕН'}")
+        for error in errors[:10]:
+            print(f"  • {error}")
+        failed |= bool(errors)
+
+    errors = check_index(files, rng)
+    print(f"Индекс против перебора: {'ПРОЙДЕН' if not errors else 'НЕ ПРОЙДЕН'}")
+    for error in errors[:10]:
+        print(f"  • {error}")
+    failed |= bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Проверка пирамиды уровней детализации (test1/piv_lod.py).
+
+Строится пирамида по длинному синтетическому треку (с переходами через
+линию перемены дат), затем окно просмотра сужается от всего трека до
+одной секунды. На каждом шаге проверяется:
+- query_time_range и query_box возвращают не больше budget точек;
+- если видимая часть укладывается в бюджет на нулевом уровне, возвращены
+  все точки трека внутри окна (ничего не потеряно при прореживании).
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test1'))
+
+import piv_lod
+
+POINTS = 1000000     # точек в треке (10 Гц, около 28 часов)
+RATE = 10.0          # точек в секунду
+BUDGETS = [piv_lod.DEFAULT_BUDGET, 100]
+WINDOWS = 40         # случайных центров окна на бюджет
+
+def make_track(rng):
+    """Случайное блуждание, долгота заворачивается через ±180°"""
+    times = np.arange(POINTS) / RATE
+    lons = np.cumsum(rng.normal(0.002, 0.001, POINTS)) + 170.0
+    lons = (lons + 180) % 360 - 180
+    lats = np.clip(np.cumsum(rng.normal(0, 0.001, POINTS)), -89.0, 89.0)
+    return times, lats, lons
+
+def zoom_steps(full, smallest):
+    """Размеры окна от full до smallest, в 4 раза меньше на каждом шаге"""
+    steps = [full]
+    while steps[-1] / 4 > smallest:
+        steps.append(steps[-1] / 4)
+    return steps + [smallest]
+
+def check_time(lod, budget, rng):
+    errors = []
+    times = lod['times']
+    for _ in range(WINDOWS):
+        center = rng.uniform(times[0], times[-1])
+        for width in zoom_steps(times[-1] - times[0], 1.0):
+            t0, t1 = center - width / 2, center + width / 2
+            t, _ = piv_lod.query_time_range(lod, t0, t1, budget)
+            if len(t) > budget:
+                errors.append(f"время [{t0:.1f}, {t1:.1f}]: {len(t)} точек > {budget}")
+            inside = times[(times >= t0) & (times <= t1)]
+            # Окно плюс по точке за краями укладывается в бюджет - это нулевой уровень
+            if len(inside) + 2 <= budget and not np.isin(inside, t).all():
+                errors.append(f"время [{t0:.1f}, {t1:.1f}]: потеряны точки")
+    return errors
+
+def check_box(lod, budget, rng):
+    errors = []
+    lats, lons = lod['lats'], lod['lons']
+    n = len(lats)
+    seg = piv_lod._segment_bbox(lats, lons, np.arange(n))
+    # Сдвиг трека за 1 секунду - самое маленькое окно
+    smallest = max(np.abs(np.diff(lons[:int(RATE) + 1])).sum(), 1e-4)
+
+    for _ in range(WINDOWS):
+        k = rng.integers(n)
+        for half in zoom_steps(180.0, smallest):
+            lon0, lon1 = lons[k] - half, lons[k] + half
+            lat0, lat1 = lats[k] - half / 2, lats[k] + half / 2
+            x, y = piv_lod.query_box(lod, lon0, lon1, lat0, lat1, budget)
+            found = ~np.isnan(x)
+            if found.sum() > budget:
+                errors.append(f"рамка ±{half:.4f}°: {found.sum()} точек > {budget}")
+
+            # Отрезков в рамке не больше budget/4 - запрос обязан дойти до
+            # нулевого уровня (на каждом уровне корзин в рамке не больше)
+            hit = (seg[0] <= lon1) & (seg[1] >= lon0) & (seg[2] <= lat1) & (seg[3] >= lat0)
+            if 4 * hit.sum() <= budget:
+                inside = np.nonzero((lons >= lon0) & (lons <= lon1)
+                                    & (lats >= lat0) & (lats <= lat1))[0]
+                returned = set(zip(x[found].tolist(), y[found].tolist()))
+                missing = [i for i in inside if (lons[i], lats[i]) not in returned]
+                if missing:
+                    errors.append(f"рамка ±{half:.4f}° у точки {k}: потеряно {len(missing)} точек")
+    return errors
+
+def main():
+    rng = np.random.default_rng(627)
+    times, lats, lons = make_track(rng)
+    lod = piv_lod.build_lod(times, lats, lons)
+    print(f"Пирамида: {POINTS} точек, уровней: {int(lod['levels'])}")
+
+    failed = False
+    for budget in BUDGETS:
+        for name, check in (('query_time_range', check_time), ('query_box', check_box)):
+            errors = check(lod, budget, rng)
+            print(f"{name}, бюджет {budget}: {'ПРОЙДЕН' if not errors else 'НЕ ПРОЙДЕН'}")
+            for error in errors[:10]:
+                print(f"  • {error}")
+            failed |= bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,40 @@
 2. Траектория (широта vs долгота)
 """
 
+import argparse
+import os
 import re
+import time
 import matplotlib.pyplot as plt
 
+# Паттерны для поиска координат в разных типах сообщений
+PATTERNS = [
+    re.compile(r'(\d+\.\d+) PIV_ID INERTIAL LAT\s+(-?\d+\.\d+) deg LON\s+(-?\d+\.\d+)'),
+    re.compile(r'(\d+\.\d+) PIV_ID COMP.*?LAT\s+(-?\d+\.\d+) deg LON\s+(-?\d+\.\d+)'),
+    re.compile(r'(\d+\.\d+) PIV_ID GNSS.*?lat\s+(-?\d+\.\d+) lon\s+(-?\d+\.\d+)')
+]
+
+# Сколько точек держим в "живом" (перерисовываемом) хвосте в режиме --follow,
+# прежде чем впечь их в фон
+FOLLOW_CHUNK = 2000
+
+# Сколько байт лога читаем за один опрос в режиме --follow
+FOLLOW_READ_BLOCK = 1 << 20
+
+def parse_piv_lines(lines, times, latitudes, longitudes):
+    """Разбираем строки лога и дописываем найденные точки в списки"""
+    found = 0
+    for line in lines:
+        for pattern in PATTERNS:
+            match = pattern.search(line)
+            if match:
+                times.append(float(match.group(1)))
+                latitudes.append(float(match.group(2)))
+                longitudes.append(float(match.group(3)))
+                found += 1
+                break  # Нашли - переходим к следующей строке
+    return found
+
 def parse_piv_log(filename):
     """Парсим лог и извлекаем время, широту и долготу"""
     print(f"Чтение файла: {filename}")
@@ -17,26 +48,8 @@ def parse_piv_log(filename):
     latitudes = []
     longitudes = []
     
-    # Паттерны для поиска координат в разных типах сообщений
-    patterns = [
-        r'(\d+\.\d+) PIV_ID INERTIAL LAT\s+(-?\d+\.\d+) deg LON\s+(-?\d+\.\d+)',
-        r'(\d+\.\d+) PIV_ID COMP.*?LAT\s+(-?\d+\.\d+) deg LON\s+(-?\d+\.\d+)',
-        r'(\d+\.\d+) PIV_ID GNSS.*?lat\s+(-?\d+\.\d+) lon\s+(-?\d+\.\d+)'
-    ]
-    
     with open(filename, 'r') as f:
-        for line in f:
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    time = float(match.group(1))
-                    lat = float(match.group(2))
-                    lon = float(match.group(3))
-                    
-                    times.append(time)
-                    latitudes.append(lat)
-                    longitudes.append(lon)
-                    break  # Нашли - переходим к следующей строке
+        parse_piv_lines(f, times, latitudes, longitudes)
     
     print(f"Найдено точек: {len(times)}")
     if times:
@@ -86,7 +99,7 @@ def plot_simple_graphs(times, latitudes, longitudes, filename):
     plt.suptitle(f'Анализ полета - {filename}', fontsize=16, fontweight='bold', y=1.02)
     
     # Сохраняем
-    output_name = f'{filename.split(".")[0]}_analysis.png'
+    output_name = f'{os.path.splitext(filename)[0]}_analysis.png'
     plt.tight_layout()
     plt.savefig(output_name, dpi=150, bbox_inches='tight')
     print(f"\nГрафики сохранены в файл: {output_name}")
@@ -95,6 +108,259 @@ def plot_simple_graphs(times, latitudes, longitudes, filename):
     
     return output_name
 
+class PivLogTail:
+    """Читаем только дописанные в лог байты (аналог tail -f)"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.mtime = None
+        self.rest = b''  # Недописанная последняя строка
+        self.behind = False  # В файле остались непрочитанные байты
+
+    def reset(self):
+        """Начинаем чтение файла с нуля (файл пересоздан или обрезан)"""
+        if self.file:
+            self.file.close()
+        self.file = open(self.filename, 'rb')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.offset = 0
+        self.mtime = None
+        self.rest = b''
+
+    def poll(self):
+        """Проверяем изменения файла.
+        Возвращает (новые строки, был ли файл начат заново).
+        За один вызов читается не больше FOLLOW_READ_BLOCK байт"""
+        restarted = False
+        try:
+            st = os.stat(self.filename)
+            if self.file is None or st.st_ino != self.inode or st.st_size < self.offset:
+                self.reset()
+                restarted = True
+        except FileNotFoundError:
+            # Ротация лога: старый файл переименован, новый еще не создан -
+            # ждем, пока файл появится снова
+            self.behind = False
+            return [], False
+
+        if not restarted and st.st_size == self.offset and st.st_mtime_ns == self.mtime:
+            return [], restarted  # Ничего не изменилось - файл не трогаем
+
+        self.mtime = st.st_mtime_ns
+        self.file.seek(self.offset)
+        data = self.file.read(min(st.st_size - self.offset, FOLLOW_READ_BLOCK))
+        self.offset += len(data)
+        self.behind = self.offset < st.st_size
+
+        data = self.rest + data
+        end = data.rfind(b'\n') + 1
+        self.rest = data[end:]
+        lines = data[:end].decode('utf-8', errors='replace').splitlines()
+        return lines, restarted
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def _expand_limits(data_low, data_high, low, high, values, margin=0.5, pad=0.02):
+    """Расширяем пределы оси, чтобы полная перерисовка была редкой.
+    Пределы считаются от настоящих min/max данных: запас margin*span
+    добавляется только с той стороны, куда данные вышли за ось, с другой
+    стороны остается небольшой отступ pad*span. Возвращает
+    (min данных, max данных, нижний предел, верхний предел, изменились ли)"""
+    new_low, new_high = min(values), max(values)
+    if data_low is not None:
+        new_low, new_high = min(data_low, new_low), max(data_high, new_high)
+    if low is not None and low <= new_low and new_high <= high:
+        return new_low, new_high, low, high, False
+    span = max(new_high - new_low, 1e-3)
+    below = low is not None and new_low < low
+    above = low is not None and new_high > high
+    return (new_low, new_high,
+            new_low - (margin if below else pad)*span,
+            new_high + (margin if above else pad)*span, True)
+
+def follow_piv_log(filename, fps=10.0, interval=0.5):
+    """Живой режим: следим за растущим логом и дорисовываем новые точки.
+
+    Разбираются только дописанные байты. Уже нарисованные точки "впекаются"
+    в фон порциями по FOLLOW_CHUNK, а на каждом кадре через blitting
+    перерисовывается только короткий хвост, поэтому нагрузка не растет
+    с размером файла. Полная перерисовка нужна лишь при расширении осей."""
+    os.stat(filename)  # Если файла нет совсем - сразу сообщаем об этом
+    print(f"Слежение за файлом: {filename} (Ctrl+C - выход)")
+
+    times = []
+    latitudes = []
+    longitudes = []
+    tail = PivLogTail(filename)
+
+    plt.ion()
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    canvas = fig.canvas
+
+    ax1.set_title('Изменение долготы от времени', fontsize=14, fontweight='bold')
+    ax1.set_xlabel('Время (секунды)', fontsize=12)
+    ax1.set_ylabel('Долгота (градусы)', fontsize=12)
+    ax1.grid(True, alpha=0.3)
+    ax1.tick_params(axis='both', which='major', labelsize=10)
+
+    ax2.set_title('Траектория полета', fontsize=14, fontweight='bold')
+    ax2.set_xlabel('Долгота (градусы)', fontsize=12)
+    ax2.set_ylabel('Широта (градусы)', fontsize=12)
+    ax2.grid(True, alpha=0.3)
+
+    plt.suptitle(f'Анализ полета (live) - {filename}', fontsize=16, fontweight='bold')
+
+    def make_tails():
+        """Анимированные линии для еще не впеченных точек"""
+        line1, = ax1.plot([], [], 'b-', linewidth=2, marker='o', markersize=3,
+                          alpha=0.7, animated=True)
+        line2, = ax2.plot([], [], 'g-', linewidth=2, marker='s', markersize=3,
+                          alpha=0.7, animated=True)
+        return line1, line2
+
+    tail1, tail2 = make_tails()
+    start_marker, = ax2.plot([], [], 'ro', markersize=8, label='Начало', zorder=5)
+    end_marker, = ax2.plot([], [], 'yo', markersize=8, label='Конец', zorder=5,
+                           animated=True)
+    ax2.legend(loc='upper right')
+
+    state = {
+        'baked': 0,        # Индекс первой точки, еще не впеченной в фон
+        'baked_lines': [],
+        'background': None,
+        'limits': [None] * 8,
+        'extent': [None] * 8,  # Настоящие min/max данных по каждой оси
+    }
+
+    def draw_tails():
+        for artist in (tail1, tail2, end_marker):
+            ax = artist.axes
+            ax.draw_artist(artist)
+
+    def on_draw(event):
+        # После полной перерисовки (в т.ч. изменения размера окна) запоминаем фон
+        state['background'] = canvas.copy_from_bbox(fig.bbox)
+        draw_tails()
+
+    canvas.mpl_connect('draw_event', on_draw)
+
+    def clear_track():
+        for line in state['baked_lines']:
+            line.remove()
+        state['baked_lines'] = []
+        state['baked'] = 0
+        state['limits'] = [None] * 8
+        state['extent'] = [None] * 8
+        times.clear()
+        latitudes.clear()
+        longitudes.clear()
+        start_marker.set_data([], [])
+        for artist in (tail1, tail2, end_marker):
+            artist.set_data([], [])
+
+    def update_tails():
+        # Хвост начинаем с последней впеченной точки, чтобы линия не рвалась
+        begin = max(state['baked'] - 1, 0)
+        tail1.set_data(times[begin:], longitudes[begin:])
+        tail2.set_data(longitudes[begin:], latitudes[begin:])
+        end_marker.set_data([longitudes[-1]], [latitudes[-1]])
+
+    def bake_tails():
+        """Переносим накопленный хвост в статические линии и в фон"""
+        nonlocal tail1, tail2
+        tail1.set_animated(False)
+        tail2.set_animated(False)
+        state['baked_lines'] += [tail1, tail2]
+        if state['background'] is not None:
+            canvas.restore_region(state['background'])
+            ax1.draw_artist(tail1)
+            ax2.draw_artist(tail2)
+            state['background'] = canvas.copy_from_bbox(fig.bbox)
+        state['baked'] = len(times)
+        tail1, tail2 = make_tails()
+
+    def update_limits(first):
+        """Проверяем, влезают ли новые точки в текущие пределы осей"""
+        lim = state['limits']
+        ext = state['extent']
+        changed = False
+        for i, (ax_set, values) in enumerate([
+                (ax1.set_xlim, times[first:]),
+                (ax1.set_ylim, longitudes[first:]),
+                (ax2.set_xlim, longitudes[first:]),
+                (ax2.set_ylim, latitudes[first:])]):
+            ext[2*i], ext[2*i + 1], low, high, grew = _expand_limits(
+                ext[2*i], ext[2*i + 1], lim[2*i], lim[2*i + 1], values)
+            if grew:
+                lim[2*i], lim[2*i + 1] = low, high
+                ax_set(low, high)
+                changed = True
+        return changed
+
+    frame_time = 1.0 / fps if fps > 0 else 0.0
+    last_frame = 0.0
+    last_poll = None
+    pending = 0        # Индекс первой точки, еще не показанной на экране
+    full_redraw = True
+
+    plt.show(block=False)
+
+    try:
+        while plt.fignum_exists(fig.number):
+            now = time.monotonic()
+            if last_poll is not None and now - last_poll < interval:
+                lines, restarted = [], False
+            else:
+                lines, restarted = tail.poll()
+                # Если файл прочитан не до конца, следующий опрос - без ожидания
+                last_poll = None if tail.behind else now
+            if restarted:
+                if times:
+                    print("Файл пересоздан или обрезан - читаем заново")
+                clear_track()
+                pending = 0
+                full_redraw = True
+
+            if parse_piv_lines(lines, times, latitudes, longitudes) and len(start_marker.get_xdata()) == 0:
+                start_marker.set_data([longitudes[0]], [latitudes[0]])
+                full_redraw = True
+
+            if (pending < len(times) or full_redraw) and now - last_frame >= frame_time:
+                if pending < len(times):
+                    if update_limits(pending):
+                        full_redraw = True
+                    pending = len(times)
+
+                    if len(times) - state['baked'] >= FOLLOW_CHUNK:
+                        update_tails()
+                        bake_tails()
+                    update_tails()
+
+                if full_redraw or state['background'] is None:
+                    canvas.draw()
+                    full_redraw = False
+                else:
+                    canvas.restore_region(state['background'])
+                    draw_tails()
+                canvas.blit(fig.bbox)
+                last_frame = now
+
+            canvas.flush_events()
+            time.sleep(min(interval, frame_time or interval, 0.05))
+    except KeyboardInterrupt:
+        print("\nСлежение остановлено")
+    finally:
+        tail.close()
+
+    print(f"Найдено точек: {len(times)}")
+    return times, latitudes, longitudes
+
 def print_statistics(times, latitudes, longitudes):
     """Выводим простую статистику"""
     print("\n" + "="*50)
@@ -131,10 +397,26 @@ def print_statistics(times, latitudes, longitudes):
 
 def main():
     """Основная функция"""
-    # Автоматически ищем файл
-    filename = "180M-E-Test.txt"
+    parser = argparse.ArgumentParser(description='Анализатор PIV логов')
+    # По умолчанию ищем файл в текущей директории
+    parser.add_argument('filename', nargs='?', default="180M-E-Test.txt",
+                        help='файл лога (по умолчанию 180M-E-Test.txt)')
+    parser.add_argument('--follow', action='store_true',
+                        help='следить за растущим логом и дорисовывать графики')
+    parser.add_argument('--fps', type=float, default=10.0,
+                        help='максимальная частота перерисовки в режиме --follow')
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help='период опроса файла в секундах в режиме --follow')
+    args = parser.parse_args()
+    filename = args.filename
     
     try:
+        if args.follow:
+            times, latitudes, longitudes = follow_piv_log(filename, args.fps, args.interval)
+            if len(times) > 1 and times[-1] > times[0]:
+                print_statistics(times, latitudes, longitudes)
+            return
+        
         # Парсим лог
         times, latitudes, longitudes = parse_piv_log(filename)
         
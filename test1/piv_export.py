@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Экспорт PIV лога в Parquet (Apache Arrow) - по таблице на тип сообщения
+(INERTIAL, COMP, GNSS, AIR, PANEL, CTRL, CONF, FLIGHTID, ...).
+
+Строка лога имеет вид
+    <время> PIV_ID <ТИП> <КЛЮЧ> <ЗНАЧЕНИЕ> [единица] <КЛЮЧ> <ЗНАЧЕНИЕ> [единица] ...
+Каждый ключ становится колонкой, единица измерения сохраняется в
+метаданных поля. Текстовые поля (FLIGHTID, CONF и т.п.) пишутся со
+словарным кодированием, числовые - как float64, '??' - как null.
+Идентификаторы и перечисления (STRING_TYPES, STRING_FIELDS) всегда
+текстовые, поэтому схема одинакова для таблиц из разных логов.
+
+Экспорт идет в два прохода с ограниченной памятью: первый проход только
+определяет схему каждой таблицы, второй пишет данные группами строк
+(row group) по ROW_GROUP_SIZE, упорядоченными по времени и со статистикой
+min/max, что позволяет читателю пропускать ненужные группы.
+"""
+
+import argparse
+import os
+import re
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Число строк в одной группе строк Parquet
+ROW_GROUP_SIZE = 65536
+
+# Единицы измерения, которые могут стоять после значения
+UNITS = {'deg', 'deg/sec', 'kt', 'ft', 'ft/min', 'nm', 'us', 'sec', 'min',
+         'hour', 'Mach', 'mbar'}
+
+# Типы сообщений, все поля которых - идентификаторы и перечисления
+STRING_TYPES = {'FLIGHTID', 'CONF'}
+
+# Поля-идентификаторы и флаги, которые нельзя хранить числом:
+# ICAO - шестнадцатеричный адрес, SQUAWK - восьмеричный код
+STRING_FIELDS = {'ICAO', 'SQUAWK', 'ALT_OFF', 'SIGN', 'STANDBY', 'GROUND'}
+
+# Значение "нет данных"
+NO_DATA = '??'
+
+# Токены строки: значения в кавычках могут содержать пробелы ('C8 ' ')
+TOKEN_RE = re.compile(r"'[^']*'|\S+")
+NUMBER_RE = re.compile(r'^-?\d+(\.\d*)?([eE][-+]?\d+)?$')
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Для экспорта нужен pyarrow: pip3 install pyarrow")
+
+def parse_piv_message(line):
+    """Разбираем строку лога: (время, тип, [(ключ, значение, единица), ...])
+    или None, если это не сообщение PIV. Значения в кавычках ('C')
+    возвращаются с кавычками - это всегда текст, даже если внутри цифра"""
+    tokens = TOKEN_RE.findall(line)
+    if len(tokens) < 3 or tokens[1] != 'PIV_ID':
+        return None
+    try:
+        time = float(tokens[0])
+    except ValueError:
+        return None
+
+    fields = []
+    i = 3
+    # Ключ без значения (например, обрезанная последняя строка) пропускаем
+    while i + 1 < len(tokens):
+        key, value = tokens[i], tokens[i + 1]
+        unit = None
+        i += 2
+        if i < len(tokens) and tokens[i] in UNITS:
+            unit = tokens[i]
+            i += 1
+        fields.append((key, value, unit))
+    return time, tokens[2], fields
+
+def _value_kind(value):
+    """Тип значения: 'float', 'str' или None для '??'"""
+    if value == NO_DATA:
+        return None
+    if NUMBER_RE.match(value):
+        return 'float'
+    return 'str'
+
+def _read_lines(filename, limit):
+    """Строки из первых limit байт файла (лог может расти во время экспорта)"""
+    with open(filename, 'rb') as f:
+        for raw in f:
+            if len(raw) > limit:
+                break
+            limit -= len(raw)
+            yield raw.decode('utf-8', errors='replace')
+
+def scan_piv_schema(filename, limit=None):
+    """Первый проход: для каждого типа сообщения собираем колонки,
+    их типы и единицы измерения. Возвращает
+    {тип: {ключ: {'kind': ..., 'unit': ...}}} в порядке появления.
+    limit - сколько байт файла читать (по умолчанию весь файл)"""
+    if limit is None:
+        limit = os.path.getsize(filename)
+    schema = {}
+    for line in _read_lines(filename, limit):
+        message = parse_piv_message(line)
+        if message is None:
+            continue
+        _, msg_type, fields = message
+        columns = schema.setdefault(msg_type, {})
+        for key, value, unit in fields:
+            fixed = msg_type in STRING_TYPES or key in STRING_FIELDS
+            column = columns.setdefault(key, {'kind': 'str' if fixed else None, 'unit': unit})
+            if column['unit'] is None:
+                column['unit'] = unit
+            if column['kind'] != 'str':
+                column['kind'] = _value_kind(value) or column['kind']
+    # Колонки, где встретилось только '??', сохраняем как числа
+    for columns in schema.values():
+        for column in columns.values():
+            if column['kind'] is None:
+                column['kind'] = 'float'
+    return schema
+
+def arrow_schema(msg_type, columns, source=None):
+    """Схема Arrow для таблицы одного типа сообщения"""
+    _require_pyarrow()
+    types = {'float': pa.float64(),
+             'str': pa.dictionary(pa.int32(), pa.string())}
+    fields = [pa.field('time', pa.float64(), nullable=False, metadata={'unit': 'sec'})]
+    for key, column in columns.items():
+        metadata = {'unit': column['unit']} if column['unit'] else None
+        fields.append(pa.field(key, types[column['kind']], metadata=metadata))
+    metadata = {'msg_type': msg_type}
+    if source:
+        metadata['source'] = os.path.basename(source)
+    return pa.schema(fields, metadata=metadata)
+
+class _TableBuffer:
+    """Буфер одной таблицы на ROW_GROUP_SIZE строк.
+    Числа сразу пишутся в массивы numpy, текст - в коды словаря, так что
+    при сбросе буферы Arrow строятся без промежуточных списков объектов."""
+
+    def __init__(self, schema, columns, capacity):
+        self.schema = schema
+        self.capacity = capacity
+        self.rows = 0
+        self.time = np.empty(capacity, dtype=np.float64)
+        self.values = {}
+        self.valid = {}
+        self.dictionaries = {}
+        for key, column in columns.items():
+            kind = column['kind']
+            if kind == 'str':
+                self.values[key] = np.zeros(capacity, dtype=np.int32)
+                self.dictionaries[key] = {}
+            else:
+                self.values[key] = np.empty(capacity, dtype=np.float64)
+            self.valid[key] = np.zeros(capacity, dtype=bool)
+
+    def append(self, time, fields):
+        row = self.rows
+        self.time[row] = time
+        for key, value, _ in fields:
+            if value == NO_DATA or key not in self.values:
+                continue
+            codes = self.dictionaries.get(key)
+            if codes is not None:
+                if value.startswith("'"):
+                    value = value[1:-1]
+                self.values[key][row] = codes.setdefault(value, len(codes))
+            else:
+                self.values[key][row] = float(value)
+            self.valid[key][row] = True
+        self.rows += 1
+        return self.rows == self.capacity
+
+    def take(self):
+        """Забираем накопленные строки как таблицу Arrow, упорядоченную по времени"""
+        rows = self.rows
+        order = None
+        if rows > 1 and np.any(np.diff(self.time[:rows]) < 0):
+            order = np.argsort(self.time[:rows], kind='stable')
+
+        def prepare(array):
+            array = array[:rows]
+            return array[order] if order is not None else array
+
+        arrays = [pa.array(prepare(self.time))]
+        for field in self.schema:
+            if field.name == 'time':
+                continue
+            values = prepare(self.values[field.name])
+            mask = ~prepare(self.valid[field.name])
+            if field.name in self.dictionaries:
+                dictionary = pa.array(list(self.dictionaries[field.name]), type=pa.string())
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values, mask=mask), dictionary))
+            else:
+                arrays.append(pa.array(values, mask=mask))
+
+        # У каждой группы строк свой словарь, иначе он растет от группы к группе
+        self.rows = 0
+        for valid in self.valid.values():
+            valid[:] = False
+        for codes in self.dictionaries.values():
+            codes.clear()
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+def export_piv_log(filename, output_dir=None, row_group_size=ROW_GROUP_SIZE):
+    """Экспортируем лог в каталог с файлами <ТИП>.parquet.
+    Возвращает {тип: число строк}"""
+    _require_pyarrow()
+    if output_dir is None:
+        output_dir = os.path.splitext(filename)[0] + '_parquet'
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Чтение файла: {filename}")
+    # Оба прохода читают одни и те же байты, даже если лог еще пишется
+    limit = os.path.getsize(filename)
+    schema = scan_piv_schema(filename, limit)
+
+    buffers = {}
+    writers = {}
+    counts = {}
+    for msg_type, columns in schema.items():
+        table_schema = arrow_schema(msg_type, columns, filename)
+        buffers[msg_type] = _TableBuffer(table_schema, columns, row_group_size)
+        dictionary_columns = [key for key, column in columns.items() if column['kind'] == 'str']
+        writers[msg_type] = pq.ParquetWriter(
+            os.path.join(output_dir, f'{msg_type}.parquet'), table_schema,
+            compression='zstd', use_dictionary=dictionary_columns or False,
+            write_statistics=True)
+        counts[msg_type] = 0
+
+    def flush(msg_type):
+        table = buffers[msg_type].take()
+        if table.num_rows:
+            writers[msg_type].write_table(table, row_group_size=row_group_size)
+            counts[msg_type] += table.num_rows
+
+    try:
+        for line in _read_lines(filename, limit):
+            message = parse_piv_message(line)
+            if message is None:
+                continue
+            time, msg_type, fields = message
+            if buffers[msg_type].append(time, fields):
+                flush(msg_type)
+        for msg_type in buffers:
+            flush(msg_type)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    print(f"Экспорт в {output_dir}:")
+    for msg_type, count in counts.items():
+        print(f"  {msg_type}: {count} строк")
+    return counts
+
+def list_piv_tables(export_dir):
+    """Типы сообщений, для которых есть таблицы в каталоге экспорта"""
+    return sorted(name[:-len('.parquet')] for name in os.listdir(export_dir)
+                  if name.endswith('.parquet'))
+
+def read_piv_table(export_dir, msg_type, columns=None, time_range=None):
+    """Читаем таблицу одного типа сообщения.
+
+    columns - список нужных колонок (время добавляется всегда), остальные
+    колонки с диска не читаются. time_range - (начало, конец) в секундах,
+    любая граница может быть None; группы строк вне интервала пропускаются
+    по статистике min/max без чтения."""
+    _require_pyarrow()
+    path = os.path.join(export_dir, f'{msg_type}.parquet')
+    if columns is not None and 'time' not in columns:
+        columns = ['time'] + list(columns)
+
+    filters = []
+    if time_range is not None:
+        start, end = time_range
+        if start is not None:
+            filters.append(('time', '>=', start))
+        if end is not None:
+            filters.append(('time', '<=', end))
+
+    return pq.read_table(path, columns=columns, filters=filters or None)
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description='Экспорт PIV лога в Parquet')
+    parser.add_argument('filename', help='файл лога')
+    parser.add_argument('-o', '--output', help='каталог для таблиц (по умолчанию <лог>_parquet)')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE,
+                        help='число строк в группе строк Parquet')
+    args = parser.parse_args()
+
+    try:
+        export_piv_log(args.filename, args.output, args.row_group_size)
+    except FileNotFoundError:
+        print(f"Файл {args.filename} не найден!")
+    except Exception as e:
+        print(f"Ошибка: {e}")
+
+if __name__ == "__main__":
+    main()
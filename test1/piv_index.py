@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Пространственный индекс по множеству PIV логов: "кто пролетал здесь".
+
+Индекс хранится в файле SQLite и пополняется по мере появления логов
+(неизмененные файлы повторно не разбираются). Трек каждого лога
+разбивается на отрезки между соседними точками. Отрезок считается дугой
+большого круга, поэтому пролет через полюс и через линию перемены дат
+(±180°) обрабатывается без особых случаев.
+
+Устройство индекса:
+- поверхность Земли разбита на ячейки CELL_DEG x CELL_DEG градусов,
+  полярные ряды ячеек сведены в одну ячейку на полюс;
+- точки трека хранятся кусками по CHUNK точек;
+- для каждой ячейки записано, какие куски каких файлов ее задевают
+  (по сферической "шапке", описанной вокруг отрезка).
+
+Запрос сначала по ячейкам выбирает куски-кандидаты, затем каждый отрезок
+кандидатов точно проверяется на пересечение с областью.
+"""
+
+import argparse
+import math
+import os
+import pathlib
+import sqlite3
+import time
+import numpy as np
+
+from piv_analyzer import parse_piv_lines
+
+# Размер ячейки сетки в градусах
+CELL_DEG = 1.0
+ROWS = int(round(180 / CELL_DEG))
+COLS = int(round(360 / CELL_DEG))
+
+# Число отрезков в одном куске трека
+CHUNK = 1024
+
+# Средний радиус Земли, км
+EARTH_RADIUS_KM = 6371.0088
+
+# Расширения файлов, которые берем при индексации каталога
+# (файлы без координат PIV, например README, в индекс не попадают)
+LOG_EXTENSIONS = ('.piv', '.txt', '.log')
+
+# Допуск для сравнений на сфере (радианы)
+EPS = 1e-12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    points INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    file_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (file_id, chunk)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cells (
+    cell INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    PRIMARY KEY (cell, file_id, chunk)
+) WITHOUT ROWID;
+"""
+
+# ===== ГЕОМЕТРИЯ НА СФЕРЕ =====
+
+def to_vectors(lats, lons):
+    """Широта/долгота (градусы) -> единичные векторы (N x 3)"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+def _normalize(v):
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v / np.where(norm > 0, norm, 1.0)
+
+def _angle(a, b):
+    """Угол между векторами (радианы), устойчиво для малых углов"""
+    return np.arctan2(np.linalg.norm(np.cross(a, b), axis=-1), np.sum(a * b, axis=-1))
+
+def _lat_lon(p):
+    """Единичные векторы -> (широта, долгота) в градусах"""
+    lat = np.degrees(np.arcsin(np.clip(p[..., 2], -1.0, 1.0)))
+    lon = np.degrees(np.arctan2(p[..., 1], p[..., 0]))
+    return lat, lon
+
+def _lon_in(lon, lon_min, lon_max):
+    """Долгота внутри интервала; lon_min > lon_max - интервал через ±180°"""
+    if lon_min <= lon_max:
+        return (lon >= lon_min - 1e-9) & (lon <= lon_max + 1e-9)
+    return (lon >= lon_min - 1e-9) | (lon <= lon_max + 1e-9)
+
+def _on_arc(p, a, b, n):
+    """Лежит ли точка p большого круга с нормалью n на дуге a->b"""
+    return ((np.sum(np.cross(a, p) * n, axis=-1) >= -EPS)
+            & (np.sum(np.cross(p, b) * n, axis=-1) >= -EPS))
+
+def segments_in_box(a, b, lat_min, lat_max, lon_min, lon_max):
+    """Точная проверка: какие дуги a[i]->b[i] задевают область
+    [lat_min, lat_max] x [lon_min, lon_max] (lon_min > lon_max - через ±180°)"""
+    full_lon = lon_min == -180 and lon_max == 180
+
+    lat_a, lon_a = _lat_lon(a)
+    lat_b, lon_b = _lat_lon(b)
+
+    def inside(lat, lon):
+        result = (lat >= lat_min - 1e-9) & (lat <= lat_max + 1e-9)
+        if not full_lon:
+            # На полюсе долгота не определена - полюс внутри, если он в рамке по широте
+            result &= _lon_in(lon, lon_min, lon_max) | (np.abs(lat) >= 90 - 1e-9)
+        return result
+
+    hit = inside(lat_a, lon_a) | inside(lat_b, lon_b)
+
+    n = np.cross(a, b)
+    has_arc = np.linalg.norm(n, axis=-1) > EPS
+    n = _normalize(n)
+    arc = _angle(a, b)
+
+    # Пересечение с меридианными сторонами рамки
+    if not full_lon:
+        for lon in (lon_min, lon_max):
+            lam = math.radians(lon)
+            meridian = np.array([-math.sin(lam), math.cos(lam), 0.0])
+            direction = np.array([math.cos(lam), math.sin(lam), 0.0])
+            d = _normalize(np.cross(n, meridian))
+            for p in (d, -d):
+                lat_p, _ = _lat_lon(p)
+                hit |= (has_arc & _on_arc(p, a, b, n)
+                        & (p @ direction >= -EPS)
+                        & (lat_p >= lat_min - 1e-9) & (lat_p <= lat_max + 1e-9))
+
+    # Пересечение с параллелями (кроме вырожденных на полюсах)
+    v = np.cross(n, a)  # направление движения из a вдоль дуги
+    radius = np.hypot(a[:, 2], v[:, 2])
+    alpha = np.arctan2(v[:, 2], a[:, 2])
+    for lat in (lat_min, lat_max):
+        if abs(lat) >= 90:
+            continue
+        z = math.sin(math.radians(lat))
+        ok = has_arc & (radius > EPS) & (np.abs(z) <= radius)
+        delta = np.arccos(np.clip(z / np.where(radius > EPS, radius, 1.0), -1.0, 1.0))
+        for theta in (alpha + delta, alpha - delta):
+            theta = np.mod(theta, 2 * np.pi)
+            p = a * np.cos(theta)[:, None] + v * np.sin(theta)[:, None]
+            _, lon_p = _lat_lon(p)
+            on_lon = np.ones(len(a), dtype=bool) if full_lon else _lon_in(lon_p, lon_min, lon_max)
+            hit |= ok & (theta <= arc + EPS) & on_lon
+
+    return hit
+
+def segments_near(a, b, point, radius_rad):
+    """Точная проверка: какие дуги a[i]->b[i] проходят не дальше radius_rad от точки"""
+    n = np.cross(a, b)
+    has_arc = np.linalg.norm(n, axis=-1) > EPS
+    n = _normalize(n)
+
+    distance = np.minimum(_angle(a, point), _angle(b, point))
+
+    # Проекция точки на большой круг дуги
+    projection = _normalize(point - np.sum(n * point, axis=-1, keepdims=True) * n)
+    to_circle = np.arcsin(np.clip(np.abs(n @ point), 0.0, 1.0))
+    inner = has_arc & _on_arc(projection, a, b, n)
+    distance = np.where(inner, np.minimum(distance, to_circle), distance)
+
+    return distance <= radius_rad + EPS
+
+# ===== ЯЧЕЙКИ СЕТКИ =====
+
+def _row(lat):
+    return min(max(int(math.floor((lat + 90) / CELL_DEG)), 0), ROWS - 1)
+
+def cell_ranges(lat_lo, lat_hi, lon_lo, lon_hi, all_lon=False):
+    """Диапазоны номеров ячеек (начало, конец) для рамки.
+    lon_hi может быть больше 180 (рамка через линию перемены дат)"""
+    ranges = []
+    if not all_lon and lon_hi - lon_lo >= 360 - CELL_DEG:
+        all_lon = True
+    if not all_lon:
+        c0 = int(math.floor((lon_lo + 180) / CELL_DEG)) % COLS
+        c1 = int(math.floor((lon_hi + 180) / CELL_DEG)) % COLS
+
+    for row in range(_row(lat_lo), _row(lat_hi) + 1):
+        base = row * COLS
+        if row == 0 or row == ROWS - 1:
+            ranges.append((base, base))  # Полярная ячейка
+        elif all_lon:
+            ranges.append((base, base + COLS - 1))
+        elif c0 <= c1:
+            ranges.append((base + c0, base + c1))
+        else:
+            ranges.append((base + c0, base + COLS - 1))
+            ranges.append((base, base + c1))
+    return ranges
+
+def cap_bounds(center, radius_rad):
+    """Рамка (lat_lo, lat_hi, lon_lo, lon_hi, all_lon) сферической шапки"""
+    lat, lon = _lat_lon(center)
+    r = math.degrees(radius_rad)
+    lat_lo, lat_hi = float(lat) - r, float(lat) + r
+    cos_lat = math.cos(math.radians(float(lat)))
+    if lat_hi >= 90 or lat_lo <= -90 or math.sin(radius_rad) >= cos_lat:
+        # Шапка накрывает полюс - все долготы
+        return max(lat_lo, -90.0), min(lat_hi, 90.0), -180.0, 180.0, True
+    dlon = math.degrees(math.asin(math.sin(radius_rad) / cos_lat))
+    return lat_lo, lat_hi, float(lon) - dlon, float(lon) + dlon, False
+
+def segment_cells(lats, lons):
+    """Ячейки, которые задевает каждый отрезок трека.
+    Возвращает массивы (номер ячейки, номер отрезка)"""
+    p = to_vectors(lats, lons)
+    a, b = p[:-1], p[1:]
+    # Шапка с центром в середине дуги и радиусом в половину дуги содержит всю дугу
+    center = _normalize(a + b)
+    radius = _angle(a, b) / 2 + 1e-9
+
+    # Быстрый путь: отрезок целиком в одной ячейке (обычный случай)
+    lat_c, lon_c = _lat_lon(center)
+    r = np.degrees(radius)
+    cos_c = np.cos(np.radians(lat_c))
+    dlon = np.degrees(np.arcsin(np.clip(np.sin(radius) / np.maximum(cos_c, EPS), 0, 1)))
+    rows_lo = np.clip(np.floor((lat_c - r + 90) / CELL_DEG), 0, ROWS - 1).astype(np.int64)
+    rows_hi = np.clip(np.floor((lat_c + r + 90) / CELL_DEG), 0, ROWS - 1).astype(np.int64)
+    cols_lo = np.floor((lon_c - dlon + 180) / CELL_DEG).astype(np.int64)
+    cols_hi = np.floor((lon_c + dlon + 180) / CELL_DEG).astype(np.int64)
+    polar = (rows_lo == 0) | (rows_hi == ROWS - 1)
+    single = (rows_lo == rows_hi) & (cols_lo == cols_hi) & ~polar & (np.sin(radius) < cos_c)
+
+    seg = np.nonzero(single)[0]
+    cells = [rows_lo[seg] * COLS + cols_lo[seg] % COLS]
+    segs = [seg]
+
+    for i in np.nonzero(~single)[0]:
+        for start, end in cell_ranges(*cap_bounds(center[i], radius[i])):
+            cells.append(np.arange(start, end + 1))
+            segs.append(np.full(end - start + 1, i))
+
+    return np.concatenate(cells), np.concatenate(segs)
+
+# ===== ИНДЕКС =====
+
+def open_index(path):
+    """Открываем (или создаем) файл индекса для пополнения"""
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+def open_index_readonly(path):
+    """Открываем существующий индекс только для чтения (для запросов)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Индекс {path} не найден! Сначала выполните build")
+    # URI через as_uri: символы ?, # и % в пути экранируются
+    return sqlite3.connect(pathlib.Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+
+def _remove_file(db, file_id):
+    db.execute("DELETE FROM cells WHERE file_id = ?", (file_id,))
+    db.execute("DELETE FROM tracks WHERE file_id = ?", (file_id,))
+    db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+def index_file(db, filename):
+    """Добавляем лог в индекс. Возвращает True - добавлен, False - уже
+    проиндексирован, None - в файле нет координат PIV (это не лог)"""
+    path = os.path.abspath(filename)
+    st = os.stat(path)
+    row = db.execute("SELECT id, size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+    if row and row[1] == st.st_size and row[2] == st.st_mtime_ns:
+        return False
+
+    times, latitudes, longitudes = [], [], []
+    with open(path, 'r', errors='replace') as f:
+        parse_piv_lines(f, times, latitudes, longitudes)
+    if not times:
+        if row:
+            with db:
+                _remove_file(db, row[0])
+        return None
+    track = np.column_stack([times, latitudes, longitudes])
+
+    with db:
+        if row:
+            _remove_file(db, row[0])
+        file_id = db.execute(
+            "INSERT INTO files (path, size, mtime, points) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, len(track))).lastrowid
+
+        # Кусок k - отрезки k*CHUNK..(k+1)*CHUNK-1, т.е. точки по (k+1)*CHUNK включительно
+        n_chunks = max(-(-(len(track) - 1) // CHUNK), 1)
+        db.executemany(
+            "INSERT INTO tracks (file_id, chunk, data) VALUES (?, ?, ?)",
+            ((file_id, k, track[k * CHUNK:(k + 1) * CHUNK + 1].tobytes())
+             for k in range(n_chunks)))
+
+        if len(track) > 1:
+            cells, segs = segment_cells(track[:, 1], track[:, 2])
+        else:
+            cells = np.array([cell_ranges(track[0, 1], track[0, 1], track[0, 2], track[0, 2])[0][0]])
+            segs = np.zeros(1, dtype=np.int64)
+        keys = np.unique(cells * n_chunks + segs // CHUNK)
+        db.executemany(
+            "INSERT INTO cells (cell, file_id, chunk) VALUES (?, ?, ?)",
+            ((int(key // n_chunks), file_id, int(key % n_chunks)) for key in keys))
+    return True
+
+def _expand_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(LOG_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def update_index(index_path, paths):
+    """Индексируем новые и измененные логи, удаляем исчезнувшие"""
+    db = open_index(index_path)
+    added = skipped = ignored = 0
+    try:
+        for filename in _expand_paths(paths):
+            try:
+                result = index_file(db, filename)
+                if result is None:
+                    ignored += 1
+                elif result:
+                    added += 1
+                    print(f"  + {filename}")
+                else:
+                    skipped += 1
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"  ! {filename}: {e}")
+
+        with db:
+            for file_id, path in db.execute("SELECT id, path FROM files").fetchall():
+                if not os.path.exists(path):
+                    _remove_file(db, file_id)
+                    print(f"  - {path}")
+    finally:
+        db.close()
+    print(f"Проиндексировано: {added}, без изменений: {skipped}, без данных PIV: {ignored}")
+    return added
+
+def _candidates(db, ranges):
+    """Куски треков (file_id, chunk), попавшие в диапазоны ячеек"""
+    found = set()
+    for start, end in ranges:
+        found.update(db.execute(
+            "SELECT file_id, chunk FROM cells WHERE cell BETWEEN ? AND ?", (start, end)))
+    return found
+
+def _refine(db, candidates, test):
+    """Точная проверка отрезков кандидатов.
+    Возвращает {путь: [(время начала, время конца), ...]}"""
+    by_file = {}
+    for file_id, chunk in candidates:
+        by_file.setdefault(file_id, []).append(chunk)
+
+    results = {}
+    for file_id, chunks in by_file.items():
+        path, = db.execute("SELECT path FROM files WHERE id = ?", (file_id,)).fetchone()
+        starts, ends, numbers = [], [], []
+        for chunk in sorted(chunks):
+            data, = db.execute("SELECT data FROM tracks WHERE file_id = ? AND chunk = ?",
+                               (file_id, chunk)).fetchone()
+            track = np.frombuffer(data, dtype=np.float64).reshape(-1, 3)
+            if len(track) == 1:
+                track = np.vstack([track, track])  # Одиночная точка - нулевой отрезок
+            starts.append(track[:-1])
+            ends.append(track[1:])
+            numbers.append(chunk * CHUNK + np.arange(len(track) - 1))
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        numbers = np.concatenate(numbers)
+
+        hit = np.nonzero(test(to_vectors(starts[:, 1], starts[:, 2]),
+                              to_vectors(ends[:, 1], ends[:, 2])))[0]
+        if len(hit) == 0:
+            continue
+
+        # Подряд идущие совпавшие отрезки склеиваем в один интервал времени
+        breaks = np.nonzero(np.diff(numbers[hit]) > 1)[0]
+        first = hit[np.concatenate([[0], breaks + 1])]
+        last = hit[np.concatenate([breaks, [len(hit) - 1]])]
+        results[path] = list(zip(starts[first, 0].tolist(), ends[last, 0].tolist()))
+    return results
+
+def query_region(index_path, lat_min, lat_max, lon_min, lon_max):
+    """Логи, чей трек задевает область. lon_min > lon_max - область через ±180°"""
+    if lat_min > lat_max:
+        raise ValueError(f"Минимальная широта {lat_min} больше максимальной {lat_max}")
+    full_lon = lon_max - lon_min >= 360 or (lon_min == -180 and lon_max == 180)
+    if full_lon:
+        lon_min, lon_max = -180, 180
+    else:
+        # Долготы вне [-180, 180) приводим к этому интервалу, как и ячейки сетки
+        lon_min = (lon_min + 180) % 360 - 180
+        lon_max = (lon_max + 180) % 360 - 180
+    db = open_index_readonly(index_path)
+    try:
+        lon_hi = lon_max if lon_min <= lon_max else lon_max + 360
+        ranges = cell_ranges(lat_min, lat_max, lon_min, lon_hi, full_lon)
+        return _refine(db, _candidates(db, ranges),
+                       lambda a, b: segments_in_box(a, b, lat_min, lat_max, lon_min, lon_max))
+    finally:
+        db.close()
+
+def query_near(index_path, lat, lon, radius_km):
+    """Логи, чей трек проходит не дальше radius_km от точки"""
+    db = open_index_readonly(index_path)
+    try:
+        point = to_vectors(lat, lon)
+        radius = radius_km / EARTH_RADIUS_KM
+        ranges = cell_ranges(*cap_bounds(point, radius))
+        return _refine(db, _candidates(db, ranges),
+                       lambda a, b: segments_near(a, b, point, radius))
+    finally:
+        db.close()
+
+def print_results(results, elapsed):
+    """Выводим найденные логи и интервалы времени"""
+    print(f"Найдено логов: {len(results)} ({elapsed * 1000:.1f} мс)")
+    for path in sorted(results):
+        print(path)
+        for t0, t1 in results[path]:
+            print(f"  {t0:.2f}с - {t1:.2f}с")
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description='Пространственный индекс PIV логов')
+    parser.add_argument('--index', default='piv_index.db', help='файл индекса')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='добавить логи (файлы или каталоги) в индекс')
+    build.add_argument('paths', nargs='+')
+
+    region = commands.add_parser('region', help='логи, пролетавшие через область')
+    region.add_argument('--lat', type=float, nargs=2, required=True, metavar=('MIN', 'MAX'))
+    region.add_argument('--lon', type=float, nargs=2, required=True, metavar=('MIN', 'MAX'),
+                        help='MIN > MAX - область через линию перемены дат')
+
+    near = commands.add_parser('near', help='логи, пролетавшие рядом с точкой')
+    near.add_argument('--lat', type=float, required=True)
+    near.add_argument('--lon', type=float, required=True)
+    near.add_argument('--radius', type=float, required=True, help='радиус, км')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            update_index(args.index, args.paths)
+            return
+
+        start = time.perf_counter()
+        if args.command == 'region':
+            results = query_region(args.index, *args.lat, *args.lon)
+        else:
+            results = query_near(args.index, args.lat, args.lon, args.radius)
+        print_results(results, time.perf_counter() - start)
+    except Exception as e:
+        print(f"Ошибка: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Многоуровневая пирамида (level of detail) для интерактивного просмотра
+длинных треков PIV.
+
+Рядом с логом сохраняется файл <лог>.lod.npz с исходными точками и
+min/max пирамидой. На каждом уровне k точки разбиты на корзины по
+FACTOR**k штук, и для каждой корзины хранятся индексы точек с минимальной
+и максимальной долготой и широтой, а также рамка (bbox) ее отрезков.
+Просмотрщик при каждом изменении пределов осей выбирает самый подробный
+уровень, на котором видимая часть укладывается в заданное число точек.
+"""
+
+import argparse
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+
+from piv_analyzer import parse_piv_log
+
+# Во сколько раз каждый следующий уровень грубее предыдущего
+FACTOR = 4
+
+# Сколько точек максимум рисуем на одном графике
+DEFAULT_BUDGET = 4000
+
+# Версия формата файла пирамиды
+LOD_VERSION = 1
+
+def lod_filename(filename):
+    """Имя файла пирамиды рядом с логом"""
+    return filename + '.lod.npz'
+
+def _group(values, n_groups, fill):
+    """Раскладываем массив по корзинам из FACTOR элементов"""
+    padded = np.full(n_groups * FACTOR, fill, dtype=values.dtype)
+    padded[:len(values)] = values
+    return padded.reshape(n_groups, FACTOR)
+
+def _reduce_extreme(values, idx, n_groups, use_max):
+    """Выбираем индексы экстремумов среди дочерних корзин"""
+    fill = -np.inf if use_max else np.inf
+    grouped = _group(values[idx], n_groups, fill)
+    pos = grouped.argmax(axis=1) if use_max else grouped.argmin(axis=1)
+    return np.take_along_axis(_group(idx, n_groups, 0), pos[:, None], axis=1)[:, 0]
+
+def _reduce_bbox(bbox, n_groups):
+    """Объединяем рамки дочерних корзин"""
+    lon_min, lon_max, lat_min, lat_max = bbox
+    return (_group(lon_min, n_groups, np.inf).min(axis=1),
+            _group(lon_max, n_groups, -np.inf).max(axis=1),
+            _group(lat_min, n_groups, np.inf).min(axis=1),
+            _group(lat_max, n_groups, -np.inf).max(axis=1))
+
+def _segment_bbox(lats, lons, starts):
+    """Рамки отрезков [i, i+1] для i из starts (у последней точки - сама точка).
+    Скачок через линию перемены дат не рисуется, поэтому такой отрезок
+    занимает только свою начальную точку."""
+    ends = np.minimum(starts + 1, len(lons) - 1)
+    lon_a, lon_b = lons[starts], lons[ends]
+    lat_a, lat_b = lats[starts], lats[ends]
+    jump = np.abs(lon_b - lon_a) > 180
+    lon_b = np.where(jump, lon_a, lon_b)
+    lat_b = np.where(jump, lat_a, lat_b)
+    return (np.minimum(lon_a, lon_b), np.maximum(lon_a, lon_b),
+            np.minimum(lat_a, lat_b), np.maximum(lat_a, lat_b))
+
+def build_lod(times, latitudes, longitudes):
+    """Строим пирамиду. Возвращает словарь массивов для сохранения в npz"""
+    times = np.asarray(times, dtype=np.float64)
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lons = np.asarray(longitudes, dtype=np.float64)
+    n = len(times)
+
+    lod = {'times': times, 'lats': lats, 'lons': lons,
+           'factor': np.int64(FACTOR), 'version': np.int64(LOD_VERSION)}
+
+    # Уровень 0 - сами точки (экстремумы) и отрезки между ними (рамки)
+    idx = {name: np.arange(n) for name in ('lon_min', 'lon_max', 'lat_min', 'lat_max')}
+    bbox = _segment_bbox(lats, lons, np.arange(n))
+
+    level = 0
+    while len(idx['lon_min']) > 1:
+        level += 1
+        n_groups = -(-len(idx['lon_min']) // FACTOR)
+        idx = {
+            'lon_min': _reduce_extreme(lons, idx['lon_min'], n_groups, False),
+            'lon_max': _reduce_extreme(lons, idx['lon_max'], n_groups, True),
+            'lat_min': _reduce_extreme(lats, idx['lat_min'], n_groups, False),
+            'lat_max': _reduce_extreme(lats, idx['lat_max'], n_groups, True),
+        }
+        bbox = _reduce_bbox(bbox, n_groups)
+        for name, values in idx.items():
+            lod[f'{name}_{level}'] = values
+        for name, values in zip(('box_lon_min', 'box_lon_max', 'box_lat_min', 'box_lat_max'), bbox):
+            lod[f'{name}_{level}'] = values
+
+    lod['levels'] = np.int64(level)
+    return lod
+
+def load_lod(filename, rebuild=False):
+    """Загружаем пирамиду, при необходимости (лог изменился) строим заново"""
+    lod_name = lod_filename(filename)
+    st = os.stat(filename)
+
+    if not rebuild and os.path.exists(lod_name):
+        with np.load(lod_name) as data:
+            lod = dict(data)
+        if (lod.get('version') == LOD_VERSION and lod.get('source_size') == st.st_size
+                and lod.get('source_mtime') == st.st_mtime_ns):
+            print(f"Пирамида загружена: {lod_name}")
+            return lod
+
+    times, latitudes, longitudes = parse_piv_log(filename)
+    lod = build_lod(times, latitudes, longitudes)
+    lod['source_size'] = np.int64(st.st_size)
+    lod['source_mtime'] = np.int64(st.st_mtime_ns)
+
+    try:
+        with open(lod_name, 'wb') as f:
+            np.savez(f, **lod)
+    except OSError as e:
+        # Каталог лога может быть только для чтения - смотрим без кэша
+        print(f"Внимание: пирамида не сохранена ({e})")
+        if os.path.exists(lod_name):
+            try:
+                os.remove(lod_name)  # Недописанный файл не должен считаться кэшем
+            except OSError:
+                pass
+        return lod
+    print(f"Пирамида сохранена: {lod_name} (уровней: {int(lod['levels'])})")
+    return lod
+
+def _bucket_points(lod, level, buckets, names):
+    """Индексы опорных точек корзин в порядке времени"""
+    if level == 0:
+        return buckets
+    reps = np.column_stack([lod[f'{name}_{level}'][buckets] for name in names])
+    reps.sort(axis=1)
+    return reps.ravel()
+
+def query_time_range(lod, t0, t1, budget=DEFAULT_BUDGET):
+    """Точки графика долготы от времени для видимого интервала [t0, t1].
+    Время в логе идет по возрастанию, поэтому интервал - это срез индексов."""
+    times = lod['times']
+    n = len(times)
+    if n == 0:
+        return np.empty(0), np.empty(0)
+
+    # Берем по точке за краями, чтобы линия доходила до границ графика
+    first = max(np.searchsorted(times, t0) - 1, 0)
+    last = min(np.searchsorted(times, t1, side='right'), n - 1)
+    if last < first:
+        last = first
+
+    for level in range(int(lod['levels']) + 1):
+        size = FACTOR ** level
+        buckets = np.arange(first // size, last // size + 1)
+        if len(buckets) * (1 if level == 0 else 2) <= budget:
+            break
+
+    idx = _bucket_points(lod, level, buckets, ('lon_min', 'lon_max'))
+    return times[idx], lod['lons'][idx]
+
+def query_box(lod, lon0, lon1, lat0, lat1, budget=DEFAULT_BUDGET):
+    """Точки траектории, попадающие в видимую рамку.
+    Спускаемся от грубого уровня к подробному только по пересекающимся
+    корзинам, пока число точек не превысит budget."""
+    lats, lons = lod['lats'], lod['lons']
+    n = len(lats)
+    if n == 0:
+        return np.empty(0), np.empty(0)
+
+    def intersects(level, buckets):
+        if level == 0:
+            # Корзина нулевого уровня - отрезок [i, i+1]
+            box = _segment_bbox(lats, lons, buckets)
+        else:
+            box = [lod[f'{name}_{level}'][buckets]
+                   for name in ('box_lon_min', 'box_lon_max', 'box_lat_min', 'box_lat_max')]
+        mask = (box[0] <= lon1) & (box[1] >= lon0) & (box[2] <= lat1) & (box[3] >= lat0)
+        return buckets[mask]
+
+    def n_buckets(level):
+        return n if level == 0 else len(lod[f'box_lon_min_{level}'])
+
+    level = int(lod['levels'])
+    buckets = intersects(level, np.arange(n_buckets(level)))
+
+    while level > 0:
+        # Дочерние корзины следующего (более подробного) уровня
+        children = (buckets[:, None] * FACTOR + np.arange(FACTOR)).ravel()
+        children = intersects(level - 1, children[children < n_buckets(level - 1)])
+        if len(children) * (2 if level == 1 else 4) > budget:
+            break
+        buckets = children
+        level -= 1
+
+    if level == 0:
+        # Для отрезка [i, i+1] нужны обе точки
+        idx = np.unique(np.concatenate([buckets, np.minimum(buckets + 1, n - 1)]))
+    else:
+        idx = np.unique(_bucket_points(lod, level, buckets,
+                                       ('lon_min', 'lon_max', 'lat_min', 'lat_max')))
+
+    x, y = lons[idx], lats[idx]
+    # Разрываем линию между несмежными корзинами и на линии перемены дат
+    if len(idx) > 1:
+        gap = np.diff(idx // FACTOR ** level) > 1
+        gap |= np.abs(np.diff(x)) > 180
+        breaks = np.nonzero(gap)[0] + 1
+        x = np.insert(x, breaks, np.nan)
+        y = np.insert(y, breaks, np.nan)
+    return x, y
+
+def view_lod(filename, budget=DEFAULT_BUDGET, rebuild=False):
+    """Интерактивный просмотр: при зуме перерисовываем нужный уровень пирамиды"""
+    lod = load_lod(filename, rebuild)
+    times, lats, lons = lod['times'], lod['lats'], lod['lons']
+    if len(times) == 0:
+        print("В файле не найдены координаты!")
+        return
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+
+    # 1. ГРАФИК: Долгота от времени
+    line1, = ax1.plot([], [], 'b-', linewidth=2, marker='o', markersize=3, alpha=0.7)
+    ax1.set_title('Изменение долготы от времени', fontsize=14, fontweight='bold')
+    ax1.set_xlabel('Время (секунды)', fontsize=12)
+    ax1.set_ylabel('Долгота (градусы)', fontsize=12)
+    ax1.grid(True, alpha=0.3)
+    ax1.tick_params(axis='both', which='major', labelsize=10)
+
+    # 2. ГРАФИК: Траектория (широта vs долгота)
+    line2, = ax2.plot([], [], 'g-', linewidth=2, marker='s', markersize=3, alpha=0.7)
+    ax2.set_title('Траектория полета', fontsize=14, fontweight='bold')
+    ax2.set_xlabel('Долгота (градусы)', fontsize=12)
+    ax2.set_ylabel('Широта (градусы)', fontsize=12)
+    ax2.grid(True, alpha=0.3)
+
+    ax2.plot(lons[0], lats[0], 'ro', markersize=8, label='Начало', zorder=5)
+    ax2.plot(lons[-1], lats[-1], 'yo', markersize=8, label='Конец', zorder=5)
+    ax2.legend()
+
+    def margin(low, high):
+        span = max(high - low, 1e-3)
+        return low - 0.1*span, high + 0.1*span
+
+    ax1.set_xlim(*margin(times[0], times[-1]))
+    ax1.set_ylim(*margin(lons.min(), lons.max()))
+    ax2.set_xlim(*margin(lons.min(), lons.max()))
+    ax2.set_ylim(*margin(lats.min(), lats.max()))
+
+    def update_time(ax):
+        t0, t1 = ax.get_xlim()
+        line1.set_data(*query_time_range(lod, t0, t1, budget))
+        fig.canvas.draw_idle()
+
+    track_state = {'limits': None, 'timer': None}
+
+    def update_track():
+        track_state['timer'] = None
+        limits = ax2.get_xlim() + ax2.get_ylim()
+        if limits == track_state['limits']:
+            return
+        track_state['limits'] = limits
+        lon0, lon1, lat0, lat1 = limits
+        line2.set_data(*query_box(lod, lon0, lon1, lat0, lat1, budget))
+        fig.canvas.draw_idle()
+
+    def schedule_track(ax):
+        # Зум и сдвиг меняют сначала xlim, потом ylim - откладываем запрос
+        # до конца обработки события, чтобы выполнить его один раз
+        if track_state['timer'] is None:
+            timer = fig.canvas.new_timer(interval=0)
+            timer.single_shot = True
+            timer.add_callback(update_track)
+            track_state['timer'] = timer
+            timer.start()
+
+    ax1.callbacks.connect('xlim_changed', update_time)
+    ax2.callbacks.connect('xlim_changed', schedule_track)
+    ax2.callbacks.connect('ylim_changed', schedule_track)
+    update_time(ax1)
+    update_track()
+
+    plt.suptitle(f'Анализ полета - {filename}', fontsize=16, fontweight='bold', y=1.02)
+    plt.tight_layout()
+    plt.show()
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description='Интерактивный просмотр длинных PIV треков')
+    parser.add_argument('filename', help='файл лога')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET,
+                        help='максимум точек на графике')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='перестроить пирамиду, даже если она актуальна')
+    parser.add_argument('--build-only', action='store_true',
+                        help='только построить пирамиду, без просмотра')
+    args = parser.parse_args()
+
+    try:
+        if args.build_only:
+            load_lod(args.filename, args.rebuild)
+        else:
+            view_lod(args.filename, args.budget, args.rebuild)
+    except FileNotFoundError:
+        print(f"Файл {args.filename} не найден!")
+    except Exception as e:
+        print(f"Ошибка: {e}")
+
+if __name__ == "__main__":
+    main()